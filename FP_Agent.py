@@ -2,10 +2,12 @@ from game import calculate_minimax
 import numpy as np
 import random
 class FP_Agent:
-    def __init__(self, payoff_matrix, actions, is_row_player=True):
+    def __init__(self, payoff_matrix, actions, is_row_player=True, rng=None):
         self.payoff_matrix = payoff_matrix
         self.actions = actions
         self.is_row_player = is_row_player
+        # 随机数来源（默认random模块，CRN实验时传入独立的随机流）
+        self.rng = rng if rng is not None else random
         # 历史联合动作记录（用于统计对手动作频率）
         self.joint_history = []  # 存储(自身动作, 对手动作)
     
@@ -15,7 +17,7 @@ class FP_Agent:
         """
         if len(self.joint_history) == 0:
             # 第一轮无历史，随机选动作
-            return random.choice(self.actions)
+            return self.rng.choice(self.actions)
         
         # 第一步：统计对手动作频率（基于历史联合动作）
         opp_actions = [h[1] for h in self.joint_history]
@@ -39,7 +41,7 @@ class FP_Agent:
         # 第三步：选期望收益最大的动作
         max_pay = max(act_expected_pay.values())
         best_acts = [act for act, pay in act_expected_pay.items() if pay == max_pay]
-        return random.choice(best_acts)
+        return self.rng.choice(best_acts)
     
     def update(self, self_act, opp_act):
         """
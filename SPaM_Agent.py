@@ -3,10 +3,11 @@ import numpy as np
 import random
 
 class SPaM_Agent:
-    def __init__(self, payoff_matrix, actions, is_row_player=True):
+    def __init__(self, payoff_matrix, actions, is_row_player=True, rng=None):
         self.payoff_matrix = payoff_matrix  # 收益矩阵
         self.actions = actions  # 所有动作（如['C','D']）
         self.is_row_player = is_row_player  # 是否为行玩家
+        self.rng = rng if rng is not None else random  # 随机数来源（默认random模块，CRN实验时传入独立的随机流）
         self.eta = 0.1  # 论文参数：探索基础概率
         self.rho = 0.8  # 论文参数：纯收益优先的探索占比
         self.epsilon = 1e-3  # 愧疚值最小量（避免为0，在 case4 使用）
@@ -184,20 +185,20 @@ class SPaM_Agent:
             S = [max(self.T.items(), key=lambda x: x[1])[0]]
         
         # 第二步：按概率选择动作
-        rand = random.random()
+        rand = self.rng.random()
         if rand < (1 - self.eta):
             # 1 - eta 概率：在 S 中选使 F 最大的动作
             max_F_in_S = max([self.F[act] for act in S])
             best_acts = [act for act in S if self.F[act] == max_F_in_S]
-            return random.choice(best_acts)
+            return self.rng.choice(best_acts)
         elif rand < (1 - self.eta) + self.rho * self.eta:
             # rho*eta 概率：选全局 F 最大的动作（无论是否在 S 中）
             max_F_global = max(self.F.values()) if len(self.F) > 0 else 0.0
             best_acts = [act for act in self.actions if self.F[act] == max_F_global]
-            return random.choice(best_acts)
+            return self.rng.choice(best_acts)
         else:
             # 其余小概率：随机探索
-            return random.choice(self.actions)
+            return self.rng.choice(self.actions)
     
     def update(self, self_act, opp_act, self_pay, opp_pay):
         """
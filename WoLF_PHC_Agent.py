@@ -2,11 +2,13 @@ from game import calculate_minimax
 import numpy as np
 import random
 class WoLF_PHC_Agent:
-    def __init__(self, payoff_matrix, actions, is_row_player=True):
+    def __init__(self, payoff_matrix, actions, is_row_player=True, rng=None):
         self.payoff_matrix = payoff_matrix
         self.actions = actions
         self.is_row_player = is_row_player
         self.num_actions = len(actions)
+        # 随机数来源（默认np.random，CRN实验时传入独立的随机流）
+        self.rng = rng
         # 策略：每个动作的选择概率
         self.policy = {act: 1.0 / self.num_actions for act in self.actions}
         # 平均策略（用于判断“赢/输”）
@@ -25,7 +27,9 @@ class WoLF_PHC_Agent:
         """
         acts = list(self.policy.keys())
         probs = list(self.policy.values())
-        return np.random.choice(acts, p=probs)
+        if self.rng is None:
+            return np.random.choice(acts, p=probs)
+        return self.rng.choices(acts, weights=probs)[0]
     
     def _get_reward(self, self_act, opp_act):
         """
@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+import numpy as np
+from game import game_payoffs, game_actions
+from train import AGENT_CLASSES, update_agent
+
+# 协议：每行一个JSON请求，服务端按同一连接的请求顺序逐行返回JSON响应
+# 请求字段：op（create/choose_action/update/close/metrics）、session（会话id），可选 id（原样返回）
+#   create:        agent（'SPaM'/'FP'/'WoLF-PHC'）、game（'pd'/'chicken'/'tricky'）、is_row_player（JSON布尔值，默认true）
+#   choose_action: 无额外字段，返回 action
+#   update:        self_act、opp_act（收益由服务端按收益矩阵计算）
+
+
+class AgentSession:
+    def __init__(self, agent):
+        self.agent = agent
+        self.last_active = time.monotonic()
+
+
+class ServerMetrics:
+    def __init__(self, window=10000):
+        """
+                  记录请求数、每轮分发的请求数和延迟（只保留最近window条，用于分位数统计）
+        """
+        self.start_time = time.monotonic()
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_batches = 0
+        self.num_evicted = 0
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+
+    def record_batch(self, latencies, num_errors):
+        self.num_batches += 1
+        self.num_requests += len(latencies)
+        self.num_errors += num_errors
+        self.batch_sizes.append(len(latencies))
+        self.latencies.extend(latencies)
+
+    def snapshot(self):
+        """
+                  返回当前指标：吞吐量（请求/秒）、平均每轮分发的请求数、延迟分位数（毫秒）
+        """
+        elapsed = time.monotonic() - self.start_time
+        result = {
+            'requests': self.num_requests,
+            'errors': self.num_errors,
+            'batches': self.num_batches,
+            'evicted_sessions': self.num_evicted,
+            'throughput': self.num_requests / elapsed if elapsed > 0 else 0.0,
+            'avg_batch_size': float(np.mean(self.batch_sizes)) if len(self.batch_sizes) > 0 else 0.0
+        }
+        if len(self.latencies) > 0:
+            p50, p90, p99 = np.percentile(np.array(self.latencies) * 1000.0, [50, 90, 99])
+            result.update({'latency_ms_p50': p50, 'latency_ms_p90': p90, 'latency_ms_p99': p99})
+        return result
+
+
+class AgentServer:
+    def __init__(self, max_pending=4096, max_batch=512, batch_window=0.0,
+                 max_inflight_per_conn=256, idle_timeout=300.0, evict_interval=5.0):
+        """
+                  按会话id托管智能体的异步决策服务端：所有连接的请求进入同一个有界队列，
+                  由单个分发循环按到达顺序逐个交给对应会话的智能体处理（智能体状态是各自的dict/list，
+                  不做跨会话的向量化更新）
+        :param max_pending: 全局待处理请求上限（队列满时停止读取连接，形成背压）
+        :param max_batch: 分发循环每轮最多处理的请求数（处理完一轮后让出事件循环）
+        :param batch_window: 每轮取到首个请求后额外等待的时间（秒）；默认0，等待只会增加延迟
+        :param max_inflight_per_conn: 单个连接未返回响应的请求上限
+        :param idle_timeout: 会话空闲超过该时间（秒）即被清除
+        :param evict_interval: 清除空闲会话的检查间隔（秒）
+        """
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_inflight_per_conn = max_inflight_per_conn
+        self.idle_timeout = idle_timeout
+        self.evict_interval = evict_interval
+        self.sessions = {}
+        self.metrics = ServerMetrics()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self._server = None
+        self._tasks = []
+        # 处理中的连接：连接任务 -> writer（关闭服务端时需要逐个关闭）
+        self._connections = {}
+        self._closing = False
+
+    async def start_tcp(self, host='127.0.0.1', port=8765):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._start_background_tasks()
+        return self._server
+
+    async def start_unix(self, path):
+        self._server = await asyncio.start_unix_server(self._handle_connection, path)
+        self._start_background_tasks()
+        return self._server
+
+    def _start_background_tasks(self):
+        self._tasks = [
+            asyncio.create_task(self._dispatch_loop()),
+            asyncio.create_task(self._evict_loop())
+        ]
+
+    async def close(self):
+        """
+                  关闭服务端：停止接受连接和分发，关闭所有连接，未处理的请求以错误响应结束
+        """
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for writer in self._connections.values():
+            writer.close()
+        self._fail_pending()
+        await asyncio.gather(*self._connections.keys(), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def _fail_pending(self):
+        while not self.queue.empty():
+            _, fut, _ = self.queue.get_nowait()
+            if not fut.done():
+                fut.set_result({'ok': False, 'error': 'server closed'})
+
+    async def submit(self, request):
+        """
+                  提交一个请求（队列满时等待），返回在请求处理完成后给出响应的future
+        """
+        fut = asyncio.get_running_loop().create_future()
+        if not self._closing:
+            await self.queue.put((request, fut, time.monotonic()))
+        # 服务端已关闭（包括在队列满时等待期间关闭）：请求不会再被处理
+        if self._closing and not fut.done():
+            fut.set_result({'ok': False, 'error': 'server closed'})
+        return fut
+
+    async def _dispatch_loop(self):
+        """
+                  分发循环：取出队列中已有的请求（至多max_batch个）依次处理
+        """
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._process_batch(batch)
+
+    def _process_batch(self, batch):
+        # 按到达顺序处理，保证同一会话的choose_action/update先后关系不变
+        now = time.monotonic()
+        latencies = []
+        num_errors = 0
+        for request, fut, enqueue_time in batch:
+            if fut.cancelled():
+                # 连接已断开，响应无人接收
+                continue
+            try:
+                response = self._handle_request(request, now)
+            except Exception as e:
+                # 任何单个请求的异常（包括智能体内部错误）都只影响该请求，分发循环继续运行
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            if not response['ok']:
+                num_errors += 1
+            if isinstance(request, dict) and 'id' in request:
+                response['id'] = request['id']
+            if not fut.done():
+                fut.set_result(response)
+            latencies.append(time.monotonic() - enqueue_time)
+        self.metrics.record_batch(latencies, num_errors)
+
+    def _handle_request(self, request, now):
+        op = request['op']
+        if op == 'metrics':
+            result = self.metrics.snapshot()
+            result.update({'sessions': len(self.sessions), 'pending': self.queue.qsize()})
+            return {'ok': True, 'metrics': result}
+
+        session_id = request['session']
+        if op == 'create':
+            if session_id in self.sessions:
+                return {'ok': False, 'error': f"session already exists: {session_id}"}
+            agent_class = AGENT_CLASSES[request['agent']]
+            game = request['game']
+            is_row_player = request.get('is_row_player', True)
+            if not isinstance(is_row_player, bool):
+                return {'ok': False, 'error': f"is_row_player must be a JSON boolean: {is_row_player!r}"}
+            agent = agent_class(game_payoffs[game], game_actions[game], is_row_player=is_row_player)
+            self.sessions[session_id] = AgentSession(agent)
+            return {'ok': True}
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            return {'ok': False, 'error': f"unknown session: {session_id}"}
+        session.last_active = now
+        agent = session.agent
+
+        if op == 'choose_action':
+            return {'ok': True, 'action': str(agent.choose_action())}
+        elif op == 'update':
+            self_act = request['self_act']
+            opp_act = request['opp_act']
+            if agent.is_row_player:
+                self_pay, opp_pay = agent.payoff_matrix[(self_act, opp_act)]
+            else:
+                opp_pay, self_pay = agent.payoff_matrix[(opp_act, self_act)]
+            update_agent(agent, self_act, opp_act, self_pay, opp_pay)
+            return {'ok': True, 'self_pay': self_pay, 'opp_pay': opp_pay}
+        elif op == 'close':
+            del self.sessions[session_id]
+            return {'ok': True}
+        return {'ok': False, 'error': f"unknown op: {op}"}
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            self.evict_idle_sessions()
+
+    def evict_idle_sessions(self):
+        """
+                  清除空闲超过idle_timeout的会话，返回清除的数量
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [sid for sid, s in self.sessions.items() if s.last_active < deadline]
+        for sid in idle:
+            del self.sessions[sid]
+        self.metrics.num_evicted += len(idle)
+        return len(idle)
+
+    async def _handle_connection(self, reader, writer):
+        # 每个连接一个有界的响应队列：写回跟不上时停止读取该连接
+        pending = asyncio.Queue(maxsize=self.max_inflight_per_conn)
+        writer_task = asyncio.create_task(self._write_responses(writer, pending))
+        connection_task = asyncio.current_task()
+        self._connections[connection_task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    fut = asyncio.get_running_loop().create_future()
+                    fut.set_result({'ok': False, 'error': 'invalid json'})
+                else:
+                    fut = await self.submit(request)
+                await pending.put(fut)
+        except ConnectionError:
+            pass
+        finally:
+            await pending.put(None)
+            await writer_task
+            writer.close()
+            del self._connections[connection_task]
+
+    async def _write_responses(self, writer, pending):
+        # 连接断开后不再写入（对已重置的连接write不会抛异常），继续取出剩余future并取消，直到读取端结束
+        closed = False
+        while True:
+            fut = await pending.get()
+            if fut is None:
+                break
+            if closed or writer.is_closing():
+                closed = True
+                fut.cancel()
+                continue
+            response = await fut
+            if writer.is_closing():
+                closed = True
+                continue
+            try:
+                writer.write((json.dumps(response) + '\n').encode())
+                # 每次写入后都drain：写缓冲低于高水位时立即返回，超过时等待，从而把背压传到读取端
+                await writer.drain()
+            except ConnectionError:
+                closed = True
+
+
+async def _serve(args):
+    server = AgentServer(max_pending=args.max_pending, max_batch=args.max_batch,
+                         batch_window=args.batch_window, idle_timeout=args.idle_timeout)
+    if args.unix:
+        await server.start_unix(args.unix)
+        print(f"智能体服务端已启动：unix:{args.unix}")
+    else:
+        await server.start_tcp(args.host, args.port)
+        print(f"智能体服务端已启动：{args.host}:{args.port}")
+    try:
+        while True:
+            await asyncio.sleep(args.metrics_interval)
+            metrics = server.metrics.snapshot()
+            print(f"会话数={len(server.sessions)} 请求数={metrics['requests']} "
+                  f"吞吐量={metrics['throughput']:.0f}/s 平均每轮分发={metrics['avg_batch_size']:.1f}")
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='智能体决策服务端（asyncio，单队列分发）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='Unix socket路径（指定后忽略host/port）')
+    parser.add_argument('--max-pending', type=int, default=4096)
+    parser.add_argument('--max-batch', type=int, default=512)
+    parser.add_argument('--batch-window', type=float, default=0.0)
+    parser.add_argument('--idle-timeout', type=float, default=300.0)
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    asyncio.run(_serve(parser.parse_args()))
@@ -0,0 +1,8 @@
+# 实验参数（main.py与job_queue.py共用，本模块不应有副作用）
+
+# 固定随机种子以便复现
+SEED = 12345
+
+total_steps = 500
+num_repeats = 10
+noise = 0.05
@@ -32,6 +32,13 @@ game_actions = {
     'tricky': ['a', 'b']
 }
 
+# 游戏名称 -> 收益矩阵（与game_actions的键一致）
+game_payoffs = {
+    'pd': pd_payoff,
+    'chicken': chicken_payoff,
+    'tricky': tricky_payoff
+}
+
 def calculate_minimax(payoff_matrix, is_row_player=True):
     """
     计算玩家的极小极大值
@@ -60,20 +67,50 @@ def calculate_minimax(payoff_matrix, is_row_player=True):
         return min(max_payoffs)  # 列玩家选“最大收益最小”的动作
         
         
-def get_actual_action(intended_action, actions, noise=0.05):
+def get_actual_action(intended_action, actions, noise=0.05, u=None):
     """
     按 (1-noise) 概率执行意图动作，noise 概率执行随机的其他动作
     支持动作数量 > 2 的情形（扰动时从其他动作随机选择）
     :param intended_action: 意图动作
     :param actions: 所有可能动作（如['C','D']）
     :param noise: 扰动概率，默认 0.05
+    :param u: 预先抽取的两个[0,1]均匀随机数 (是否扰动, 选哪个其他动作)，用于公共随机数实验；
+              为 None 时使用 random 模块
     :return: 实际执行的动作
     """
-    if random.random() < (1 - noise):
-        return intended_action
-    else:
-        others = [a for a in actions if a != intended_action]
-        if len(others) == 0:
+    if u is None:
+        if random.random() < (1 - noise):
             return intended_action
-        return random.choice(others)
+        else:
+            others = [a for a in actions if a != intended_action]
+            if len(others) == 0:
+                return intended_action
+            return random.choice(others)
+    # 使用预先抽取的随机数：每步固定消耗两个，保证不同实验间的随机数逐步对齐
+    u_flip, u_pick = u
+    if u_flip < (1 - noise):
+        return intended_action
+    others = [a for a in actions if a != intended_action]
+    if len(others) == 0:
+        return intended_action
+    return others[min(int(u_pick * len(others)), len(others) - 1)]
+
+
+class SyncedRandom(random.Random):
+    """
+    用于公共随机数（CRN）/对偶（antithetic）实验的随机数生成器
+    对偶模式下 random() 返回 1-u；choice/choices 都由 random() 得到，
+    因此同一种子的一对生成器（antithetic=False/True）给出对偶的抽样
+    """
+    def __init__(self, seed=None, antithetic=False):
+        self.antithetic = antithetic
+        super().__init__(seed)
+
+    def random(self):
+        u = super().random()
+        return 1.0 - u if self.antithetic else u
+
+    def choice(self, seq):
+        # 对偶模式下random()可能取到1.0，需截断下标
+        return seq[min(int(self.random() * len(seq)), len(seq) - 1)]
 
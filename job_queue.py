@@ -0,0 +1,396 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import config
+from game import game_payoffs, game_actions
+from train import repeat_experiments, AGENT_CLASSES
+
+# 共享目录作业队列：多台机器上的worker通过同一目录（如NFS）领取、运行、提交实验
+# 目录结构：
+#   jobs/<job_id>.json            作业参数（入队时原子写入，同一参数只会有一个作业）
+#   leases/<job_id>/<n>.lease     第n代租约：代数最大的租约文件的创建者持有作业，worker定期刷新其mtime作为心跳
+#   results/<job_id>.json         结果（先写临时文件再用os.link提交，已存在则不覆盖）
+#   failed/<job_id>.json          运行失败的作业及traceback（删除该文件即可重新运行）
+# worker崩溃后租约不再刷新，超过lease_ttl即视为过期，其他worker以O_EXCL创建第n+1代租约接管该作业；
+# 每一代只能被创建一次，且作业完成前不会删除任何租约文件，因此接管时不会移走仍有效的租约。
+# 注意：过期判断基于文件mtime，各机器时钟需大致同步（偏差应远小于lease_ttl）。
+
+# 场景名称 -> (游戏, 是否需分行/列Learner)，与main.py中的场景一致
+SCENES = {
+    "Prisoner's Dilemma": ('pd', False),
+    'Chicken': ('chicken', False),
+    'Tricky Game': ('tricky', True)
+}
+
+
+def make_job_id(job):
+    """
+         作业id = 作业参数的哈希（参数相同的作业id相同，避免重复入队）
+    """
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_jobs(scenes, seeds, noises, total_steps_list, num_repeats_list):
+    """
+         生成全部作业：场景 × Learner × 对手 × 角色 × 种子 × 超参数
+    """
+    jobs = []
+    for scene_name in scenes:
+        game, need_row_col_split = SCENES[scene_name]
+        roles = [True, False] if need_row_col_split else [True]
+        for learner, opponent, is_learner_row, seed, noise, total_steps, num_repeats in itertools.product(
+                AGENT_CLASSES.keys(), AGENT_CLASSES.keys(), roles, seeds, noises, total_steps_list, num_repeats_list):
+            jobs.append({
+                'scene': scene_name, 'game': game,
+                'learner': learner, 'opponent': opponent, 'is_learner_row': is_learner_row,
+                'seed': seed, 'noise': noise, 'total_steps': total_steps, 'num_repeats': num_repeats
+            })
+    return jobs
+
+
+def run_job(job):
+    """
+         运行单个作业（与main.get_learner_data相同），返回Learner的(mean, std)
+    """
+    learner_class = AGENT_CLASSES[job['learner']]
+    opponent_class = AGENT_CLASSES[job['opponent']]
+    if job['is_learner_row']:
+        agent1_class, agent2_class = learner_class, opponent_class
+    else:
+        agent1_class, agent2_class = opponent_class, learner_class
+    exp_result = repeat_experiments(
+        agent1_class=agent1_class, agent2_class=agent2_class,
+        payoff_matrix=game_payoffs[job['game']], actions=game_actions[job['game']],
+        num_repeats=job['num_repeats'], total_steps=job['total_steps'],
+        noise=job['noise'], seed=job['seed']
+    )
+    return exp_result[0] if job['is_learner_row'] else exp_result[1]
+
+
+def _write_json_tmp(path, data):
+    tmp_path = f"{path}.tmp.{socket.gethostname()}.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    return tmp_path
+
+
+def _write_json_atomic(path, data):
+    os.replace(_write_json_tmp(path, data), path)
+
+
+class JobQueue:
+    def __init__(self, queue_dir, lease_ttl=60.0):
+        self.queue_dir = queue_dir
+        self.lease_ttl = lease_ttl
+        self.jobs_dir = os.path.join(queue_dir, 'jobs')
+        self.leases_dir = os.path.join(queue_dir, 'leases')
+        self.results_dir = os.path.join(queue_dir, 'results')
+        self.failed_dir = os.path.join(queue_dir, 'failed')
+        for d in (self.jobs_dir, self.leases_dir, self.results_dir, self.failed_dir):
+            os.makedirs(d, exist_ok=True)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _lease_dir(self, job_id):
+        return os.path.join(self.leases_dir, job_id)
+
+    def _lease_path(self, job_id, generation):
+        return os.path.join(self._lease_dir(job_id), f"{generation}.lease")
+
+    def _result_path(self, job_id):
+        return os.path.join(self.results_dir, f"{job_id}.json")
+
+    def _failed_path(self, job_id):
+        return os.path.join(self.failed_dir, f"{job_id}.json")
+
+    def enqueue(self, jobs):
+        """
+                  写入作业（已存在的作业跳过），返回新增作业数
+        """
+        num_added = 0
+        for job in jobs:
+            job_path = self._job_path(make_job_id(job))
+            if not os.path.exists(job_path):
+                _write_json_atomic(job_path, job)
+                num_added += 1
+        return num_added
+
+    def job_ids(self):
+        return sorted(name[:-len('.json')] for name in os.listdir(self.jobs_dir) if name.endswith('.json'))
+
+    def load_job(self, job_id):
+        with open(self._job_path(job_id)) as f:
+            return json.load(f)
+
+    def is_done(self, job_id):
+        return os.path.exists(self._result_path(job_id))
+
+    def is_failed(self, job_id):
+        return os.path.exists(self._failed_path(job_id))
+
+    def _max_generation(self, job_id):
+        """
+                  当前租约的代数（0表示从未被领取）
+        """
+        try:
+            names = os.listdir(self._lease_dir(job_id))
+        except FileNotFoundError:
+            return 0
+        generations = [int(name[:-len('.lease')]) for name in names
+                       if name.endswith('.lease') and name[:-len('.lease')].isdigit()]
+        return max(generations, default=0)
+
+    def _lease_mtime(self, job_id, generation):
+        try:
+            return os.stat(self._lease_path(job_id, generation)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _lease_expired(self, job_id, generation):
+        # 租约文件暂时不可见时按未过期处理，宁可等待也不重复领取
+        mtime = self._lease_mtime(job_id, generation)
+        return mtime is not None and time.time() - mtime > self.lease_ttl
+
+    def try_claim(self, job_id, worker_id):
+        """
+                  尝试领取作业：以O_EXCL创建下一代租约（当前无租约或当前租约已过期/已释放时）
+        :return: 领取成功返回租约代数，否则返回None
+        """
+        if self.is_done(job_id) or self.is_failed(job_id):
+            return None
+        generation = self._max_generation(job_id)
+        if generation > 0 and not self._lease_expired(job_id, generation):
+            return None
+        new_generation = generation + 1
+        os.makedirs(self._lease_dir(job_id), exist_ok=True)
+        try:
+            fd = os.open(self._lease_path(job_id, new_generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # 其他worker已抢先创建该代租约
+            return None
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': worker_id, 'claimed_at': time.time()}, f)
+        # 领取期间可能已有其他worker提交结果，或已有更新一代的租约
+        if self.is_done(job_id) or self._max_generation(job_id) > new_generation:
+            self.release(job_id, new_generation)
+            return None
+        return new_generation
+
+    def heartbeat(self, job_id, generation):
+        """
+                  刷新租约mtime；只有在作业已完成或已被其他worker以更新一代租约接管时才返回False
+        """
+        if self.is_done(job_id) or self._max_generation(job_id) > generation:
+            return False
+        lease_path = self._lease_path(job_id, generation)
+        try:
+            os.utime(lease_path)
+        except FileNotFoundError:
+            # 租约文件暂时不可见（如NFS属性缓存），重建后继续持有
+            os.close(os.open(lease_path, os.O_CREAT | os.O_WRONLY))
+        return True
+
+    def release(self, job_id, generation):
+        """
+                  释放租约：作业已完成则删除该作业的全部租约，否则把本代租约标记为已释放（mtime=0，立即视为过期）
+        """
+        if self.is_done(job_id):
+            shutil.rmtree(self._lease_dir(job_id), ignore_errors=True)
+            return
+        try:
+            os.utime(self._lease_path(job_id, generation), (0, 0))
+        except FileNotFoundError:
+            pass
+
+    def commit(self, job_id, result):
+        """
+                  提交结果：先写临时文件，再os.link到结果路径（目标已存在时失败，因此不会覆盖），返回是否提交成功
+        """
+        result_path = self._result_path(job_id)
+        tmp_path = _write_json_tmp(result_path, result)
+        try:
+            os.link(tmp_path, result_path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def record_failure(self, job_id, worker_id, error):
+        _write_json_atomic(self._failed_path(job_id), {
+            'job_id': job_id, 'worker': worker_id, 'time': time.time(), 'traceback': error
+        })
+
+    def status(self):
+        num_done = 0
+        num_failed = 0
+        num_leased = 0
+        num_expired = 0
+        job_ids = self.job_ids()
+        for job_id in job_ids:
+            if self.is_done(job_id):
+                num_done += 1
+            elif self.is_failed(job_id):
+                num_failed += 1
+            else:
+                generation = self._max_generation(job_id)
+                mtime = self._lease_mtime(job_id, generation) if generation > 0 else None
+                # mtime为0表示租约已释放，作业回到待领取状态
+                if mtime:
+                    num_leased += 1
+                    num_expired += int(self._lease_expired(job_id, generation))
+        return {'total': len(job_ids), 'done': num_done, 'failed': num_failed, 'leased': num_leased,
+                'expired_leases': num_expired,
+                'pending': len(job_ids) - num_done - num_failed - num_leased}
+
+    def merge(self, output_path):
+        """
+                  合并所有结果到同一个JSON文件（与已有文件合并），返回结果数
+        """
+        store = {}
+        if os.path.exists(output_path):
+            with open(output_path) as f:
+                store = json.load(f)
+        for name in os.listdir(self.results_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(self.results_dir, name)) as f:
+                    store[name[:-len('.json')]] = json.load(f)
+        _write_json_atomic(output_path, store)
+        return len(store)
+
+
+def run_worker(queue, worker_id=None, poll_interval=5.0, max_jobs=None):
+    """
+         worker主循环：随机顺序扫描作业并领取（减少多个worker争抢同一作业），全部完成或失败后退出
+    :param max_jobs: 最多运行的作业数（None=不限）
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    rng = random.Random(worker_id)
+    num_run = 0
+    while max_jobs is None or num_run < max_jobs:
+        job_ids = [job_id for job_id in queue.job_ids()
+                   if not queue.is_done(job_id) and not queue.is_failed(job_id)]
+        if len(job_ids) == 0:
+            break
+        rng.shuffle(job_ids)
+        claimed, generation = None, None
+        for job_id in job_ids:
+            generation = queue.try_claim(job_id, worker_id)
+            if generation is not None:
+                claimed = job_id
+                break
+        if claimed is None:
+            # 剩余作业都被其他worker持有：等待其完成或租约过期
+            time.sleep(poll_interval)
+            continue
+
+        stop = threading.Event()
+
+        def keep_alive(job_id=claimed, generation=generation):
+            while not stop.wait(queue.lease_ttl / 3):
+                try:
+                    if not queue.heartbeat(job_id, generation):
+                        break
+                except OSError:
+                    # 共享目录暂时不可用：下次继续尝试
+                    pass
+
+        heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat_thread.start()
+        start = time.time()
+        try:
+            try:
+                job = queue.load_job(claimed)
+                mean, std = run_job(job)
+            except Exception:
+                # 作业本身出错（如作业文件损坏）：记录失败，worker继续处理其他作业；
+                # 若租约已被更新一代接管，本worker已不再持有该作业，不记录失败
+                if queue._max_generation(claimed) > generation:
+                    print(f"[{worker_id}] 出错，但租约已被其他worker接管，不记录失败：{claimed}")
+                else:
+                    queue.record_failure(claimed, worker_id, traceback.format_exc())
+                    print(f"[{worker_id}] 失败：{claimed}（详见 failed/{claimed}.json）")
+            else:
+                try:
+                    committed = queue.commit(claimed, {
+                        'job': job, 'mean': mean.tolist(), 'std': std.tolist(),
+                        'worker': worker_id, 'elapsed': time.time() - start
+                    })
+                except OSError as e:
+                    # 共享目录暂时不可用：不记为失败，释放租约后由worker重新领取
+                    print(f"[{worker_id}] 提交失败，稍后重试：{claimed}（{e}）")
+                else:
+                    print(f"[{worker_id}] {'完成' if committed else '重复（已由其他worker提交）'}：{claimed} "
+                          f"{job['scene']} {job['learner']} vs {job['opponent']} seed={job['seed']}")
+        finally:
+            stop.set()
+            heartbeat_thread.join()
+            queue.release(claimed, generation)
+        num_run += 1
+    return num_run
+
+
+def run_local(queue_dir, num_workers, lease_ttl, poll_interval):
+    """
+         本机启动num_workers个worker子进程（模拟多机），全部退出后返回各自的退出码
+    """
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                          '--queue-dir', queue_dir, '--lease-ttl', str(lease_ttl), 'worker',
+                          '--poll-interval', str(poll_interval), '--worker-id', f"local-{i}"])
+        for i in range(num_workers)
+    ]
+    return [p.wait() for p in processes]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='共享目录作业队列：多机分布式运行实验')
+    parser.add_argument('--queue-dir', default='job_queue')
+    parser.add_argument('--lease-ttl', type=float, default=60.0, help='租约过期时间（秒）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='写入作业')
+    enqueue_parser.add_argument('--scenes', nargs='+', default=list(SCENES.keys()), choices=list(SCENES.keys()))
+    enqueue_parser.add_argument('--seeds', type=int, nargs='+', default=[config.SEED])
+    enqueue_parser.add_argument('--noise', type=float, nargs='+', default=[config.noise])
+    enqueue_parser.add_argument('--total-steps', type=int, nargs='+', default=[config.total_steps])
+    enqueue_parser.add_argument('--num-repeats', type=int, nargs='+', default=[config.num_repeats])
+
+    for name, help_text in (('worker', '领取并运行作业'), ('local', '本机启动多个worker')):
+        worker_parser = subparsers.add_parser(name, help=help_text)
+        worker_parser.add_argument('--poll-interval', type=float, default=5.0)
+        if name == 'worker':
+            worker_parser.add_argument('--worker-id', default=None)
+            worker_parser.add_argument('--max-jobs', type=int, default=None)
+        else:
+            worker_parser.add_argument('--workers', type=int, default=4)
+
+    subparsers.add_parser('status', help='查看作业进度')
+    merge_parser = subparsers.add_parser('merge', help='合并结果')
+    merge_parser.add_argument('--output', default='results.json')
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue_dir, lease_ttl=args.lease_ttl)
+    if args.command == 'enqueue':
+        jobs = build_jobs(args.scenes, args.seeds, args.noise, args.total_steps, args.num_repeats)
+        print(f"新增作业 {queue.enqueue(jobs)} 个（共 {len(jobs)} 个）")
+    elif args.command == 'worker':
+        run_worker(queue, worker_id=args.worker_id, poll_interval=args.poll_interval, max_jobs=args.max_jobs)
+    elif args.command == 'local':
+        exit_codes = run_local(args.queue_dir, args.workers, args.lease_ttl, args.poll_interval)
+        print(f"worker退出码：{exit_codes}，进度：{queue.status()}")
+    elif args.command == 'status':
+        print(queue.status())
+    elif args.command == 'merge':
+        print(f"已合并 {queue.merge(args.output)} 条结果到 {args.output}")
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from game import game_payoffs, game_actions, get_actual_action
+from train import AGENT_CLASSES
+from agent_server import AgentServer
+
+
+class AgentClient:
+    def __init__(self, reader, writer):
+        """
+                  智能体服务端客户端：同一连接上可流水线发送多个请求，响应按发送顺序返回
+        """
+        self.reader = reader
+        self.writer = writer
+        self._pending = deque()
+        self._read_task = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, request):
+        fut = asyncio.get_running_loop().create_future()
+        # 入队与写入之间不能有await，否则响应与future的对应关系会错乱
+        self._pending.append(fut)
+        self.writer.write((json.dumps(request) + '\n').encode())
+        await self.writer.drain()
+        response = await fut
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response
+
+    async def _read_loop(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            self._pending.popleft().set_result(json.loads(line))
+        while self._pending:
+            self._pending.popleft().set_exception(ConnectionError('connection closed'))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self._read_task
+
+
+async def simulate_match(client, match_id, agent1_name, agent2_name, game, total_steps=50, noise=0.05):
+    """
+         通过服务端模拟一局重复博弈（与train.single_experiment流程一致），返回双方平均收益
+    """
+    payoff_matrix = game_payoffs[game]
+    actions = game_actions[game]
+    row_id, col_id = f"{match_id}-row", f"{match_id}-col"
+    await asyncio.gather(
+        client.call({'op': 'create', 'session': row_id, 'agent': agent1_name, 'game': game, 'is_row_player': True}),
+        client.call({'op': 'create', 'session': col_id, 'agent': agent2_name, 'game': game, 'is_row_player': False})
+    )
+    agent1_total_pay = 0.0
+    agent2_total_pay = 0.0
+    for _ in range(total_steps):
+        resp1, resp2 = await asyncio.gather(
+            client.call({'op': 'choose_action', 'session': row_id}),
+            client.call({'op': 'choose_action', 'session': col_id})
+        )
+        agent1_act = get_actual_action(resp1['action'], actions, noise=noise)
+        agent2_act = get_actual_action(resp2['action'], actions, noise=noise)
+        agent1_pay, agent2_pay = payoff_matrix[(agent1_act, agent2_act)]
+        agent1_total_pay += agent1_pay
+        agent2_total_pay += agent2_pay
+        await asyncio.gather(
+            client.call({'op': 'update', 'session': row_id, 'self_act': agent1_act, 'opp_act': agent2_act}),
+            client.call({'op': 'update', 'session': col_id, 'self_act': agent2_act, 'opp_act': agent1_act})
+        )
+    await asyncio.gather(
+        client.call({'op': 'close', 'session': row_id}),
+        client.call({'op': 'close', 'session': col_id})
+    )
+    return agent1_total_pay / total_steps, agent2_total_pay / total_steps
+
+
+async def run_load(num_matches=1000, total_steps=50, num_connections=16, game='pd', noise=0.05,
+                   host='127.0.0.1', port=8765, unix_path=None, spawn_server=True):
+    """
+         并发模拟num_matches局博弈（每局2个会话），打印客户端吞吐量和服务端指标
+    :param spawn_server: True=在本进程内启动服务端（Unix socket），False=连接已有服务端
+    """
+    server = None
+    tmp_dir = None
+    if spawn_server:
+        tmp_dir = tempfile.mkdtemp()
+        unix_path = os.path.join(tmp_dir, 'agent_server.sock')
+        server = AgentServer()
+        await server.start_unix(unix_path)
+
+    clients = [await AgentClient.connect(host, port, unix_path) for _ in range(num_connections)]
+    agent_pairs = list(itertools.product(AGENT_CLASSES.keys(), repeat=2))
+    start = time.monotonic()
+    results = await asyncio.gather(*[
+        simulate_match(clients[i % num_connections], f"match-{i}",
+                       agent_pairs[i % len(agent_pairs)][0], agent_pairs[i % len(agent_pairs)][1],
+                       game, total_steps, noise)
+        for i in range(num_matches)
+    ])
+    elapsed = time.monotonic() - start
+    metrics = (await clients[0].call({'op': 'metrics'}))['metrics']
+
+    for client in clients:
+        await client.close()
+    if server is not None:
+        await server.close()
+        os.remove(unix_path)
+        os.rmdir(tmp_dir)
+
+    num_requests = num_matches * (4 * total_steps + 4)
+    print(f"完成 {num_matches} 局（{2 * num_matches} 个会话，每局 {total_steps} 轮），耗时 {elapsed:.2f}s")
+    print(f"客户端吞吐量：{num_requests / elapsed:.0f} 请求/秒")
+    print("服务端指标：" + ", ".join(
+        f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items()))
+    return results, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='智能体服务端压测：本地模拟大量并发博弈会话')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--game', default='pd', choices=list(game_payoffs.keys()))
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='已有服务端的Unix socket路径')
+    parser.add_argument('--external', action='store_true', help='连接已有服务端，而不是在本进程内启动')
+    args = parser.parse_args()
+    asyncio.run(run_load(num_matches=args.matches, total_steps=args.steps, num_connections=args.connections,
+                         game=args.game, noise=args.noise, host=args.host, port=args.port,
+                         unix_path=args.unix, spawn_server=not args.external))
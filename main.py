@@ -1,32 +1,24 @@
 import numpy as np
 import random
 from game import pd_payoff, chicken_payoff, tricky_payoff, game_actions, get_actual_action
-from train import single_experiment, repeat_experiments
+from train import single_experiment, repeat_experiments, crn_experiments, AGENT_CLASSES
 from SPaM_Agent import SPaM_Agent
 from FP_Agent import FP_Agent
 from WoLF_PHC_Agent import WoLF_PHC_Agent
+from config import SEED, total_steps, num_repeats, noise
 import matplotlib.pyplot as plt
 import os
 
 # 创建保存图片的目录
 os.makedirs('plots', exist_ok=True)
 
-# 固定随机种子以便复现
-SEED = 12345
+# 固定随机种子以便复现（实验参数定义在config.py）
 random.seed(SEED)
 np.random.seed(SEED)
 
-# 实验参数
-total_steps = 500
-num_repeats = 10
-noise = 0.05
-
-# 定义三种Learner算法类（统一对比SPaM/FP/WoLF-PHC）
-LEARNER_CLASSES = {
-    'SPaM': SPaM_Agent,
-    'FP': FP_Agent,
-    'WoLF-PHC': WoLF_PHC_Agent
-}
+# 方差缩减模式：同一对手下各Learner共享随机流（公共随机数CRN），可选再加对偶随机流
+use_crn = False
+use_antithetic = False
 
 # 定义Learner样式（固定，确保所有图风格统一）
 LEARNER_STYLES = {
@@ -62,6 +54,103 @@ def get_learner_data(learner_class, opponent_class, payoff_matrix, actions, is_l
         return exp_result[1]  # agent2（Learner列）的(mean, std)
 
 
+# 双侧95%置信区间的Student-t分位数（自由度1~30；未安装scipy，故查表）
+T_QUANTILES_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+
+
+def t_quantile_95(df):
+    """
+    工具函数：双侧95%的t分位数；自由度超过30时用Cornish-Fisher展开近似（误差<0.002）
+    """
+    if df < 1:
+        raise ValueError(f"t分位数的自由度必须 >= 1，当前为 {df}")
+    if df <= len(T_QUANTILES_95):
+        return T_QUANTILES_95[df - 1]
+    z = 1.959964
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+
+def paired_difference_stats(samples_a, samples_b, runs_a, runs_b, runs_per_sample):
+    """
+    工具函数：计算两个Learner的配对差分曲线及其95%置信区间（自由度n-1的t分布），以及方差缩减倍数
+    :param samples_a/samples_b: CRN样本（形状 num_repeats × steps，同一行使用相同随机流）
+    :param runs_a/runs_b: 单次运行曲线（用于估计独立抽样时的方差）
+    :param runs_per_sample: 每个样本包含的运行次数（对偶模式为2）
+    :return: (diff_mean, ci, variance_reduction)
+             variance_reduction = 相同运行次数下独立抽样的差分方差 / 配对差分方差（对所有步求和后相除）
+    """
+    diffs = samples_a - samples_b
+    n = diffs.shape[0]
+    if n < 2:
+        raise ValueError(f"配对差分的置信区间至少需要2个重复（num_repeats >= 2），当前为 {n}")
+    diff_mean = np.mean(diffs, axis=0)
+    diff_var = np.var(diffs, axis=0, ddof=1)
+    ci = t_quantile_95(n - 1) * np.sqrt(diff_var / n)
+    indep_var = (np.var(runs_a, axis=0, ddof=1) + np.var(runs_b, axis=0, ddof=1)) / runs_per_sample
+    paired_var_sum = np.sum(diff_var)
+    variance_reduction = np.sum(indep_var) / paired_var_sum if paired_var_sum > 0 else float('inf')
+    return diff_mean, ci, variance_reduction
+
+
+def get_crn_learner_data(opponent_class, payoff_matrix, actions, is_learner_row=True, seed=SEED):
+    """
+    工具函数：CRN模式下获取三种Learner对抗同一对手的数据
+    :return: (learner_data, paired_diffs)
+             learner_data: 键=Learner名称，值=(mean, std)
+             paired_diffs: 键=(Learner A, Learner B)，值=(diff_mean, ci, variance_reduction)
+    """
+    samples, runs = crn_experiments(
+        learner_classes=AGENT_CLASSES, opponent_class=opponent_class,
+        payoff_matrix=payoff_matrix, actions=actions,
+        num_repeats=num_repeats, total_steps=total_steps,
+        is_learner_row=is_learner_row, noise=noise, seed=seed, antithetic=use_antithetic
+    )
+    # 标准差按单次运行计算（对偶模式下样本是成对平均，其标准差会偏小，与非CRN图的含义不一致）
+    learner_data = {name: (np.mean(curves, axis=0), np.std(runs[name], axis=0)) for name, curves in samples.items()}
+    runs_per_sample = 2 if use_antithetic else 1
+    learner_names = list(AGENT_CLASSES.keys())
+    paired_diffs = {}
+    for i, name_a in enumerate(learner_names):
+        for name_b in learner_names[i + 1:]:
+            paired_diffs[(name_a, name_b)] = paired_difference_stats(
+                samples[name_a], samples[name_b], runs[name_a], runs[name_b], runs_per_sample)
+    return learner_data, paired_diffs
+
+
+def collect_learner_data(opponent_class, payoff_matrix, actions, is_learner_row, seed_offset):
+    """
+    工具函数：收集三种Learner对抗同一对手的数据
+    非CRN模式下每个Learner使用不同种子；CRN模式下三者共享同一种子（同一组随机流）
+    :return: (learner_data, paired_diffs, 新的seed_offset)，非CRN模式下paired_diffs为None
+    """
+    if use_crn:
+        learner_data, paired_diffs = get_crn_learner_data(
+            opponent_class=opponent_class,
+            payoff_matrix=payoff_matrix,
+            actions=actions,
+            is_learner_row=is_learner_row,
+            seed=SEED + seed_offset
+        )
+        return learner_data, paired_diffs, seed_offset + 1
+
+    learner_data = {}
+    for learner_name, learner_class in AGENT_CLASSES.items():
+        learner_data[learner_name] = get_learner_data(
+            learner_class=learner_class,
+            opponent_class=opponent_class,
+            payoff_matrix=payoff_matrix,
+            actions=actions,
+            is_learner_row=is_learner_row,
+            seed=SEED + seed_offset
+        )
+        seed_offset += 1  # 每次实验种子+1，保证独立性
+    return learner_data, None, seed_offset
+
+
 def plot_three_learners(results_dict, title, save_path=None):
     """
     绘制单张图（3条线：三种Learner对抗同一对手）
@@ -115,66 +204,83 @@ def run_scene_experiments(scene_name, payoff_matrix, actions, need_row_col_split
     if not need_row_col_split:
         for opp_name, opp_class in OPPONENTS.items():
             # 收集三种Learner对抗当前对手的数据（Learner均为行玩家，角色对称）
-            learner_data = {}
-            for learner_name, learner_class in LEARNER_CLASSES.items():
-                learner_data[learner_name] = get_learner_data(
-                    learner_class=learner_class,
-                    opponent_class=opp_class,
-                    payoff_matrix=payoff_matrix,
-                    actions=actions,
-                    is_learner_row=True,
-                    seed=SEED + seed_offset
-                )
-                seed_offset += 1  # 每次实验种子+1，保证独立性
+            learner_data, paired_diffs, seed_offset = collect_learner_data(
+                opp_class, payoff_matrix, actions, is_learner_row=True, seed_offset=seed_offset)
 
             # 绘制单张图（3条线：三种Learner对抗当前对手）
             plot_title = f"{scene_name}: 3 Learners vs {opp_name.replace('_Opp', '')}"
             save_path = f"plots/{scene_name.lower().replace(' ', '_')}_learners_vs_{opp_name.lower().replace('_opp', '')}.png"
             plot_three_learners(learner_data, plot_title, save_path)
             print(f"→ 已生成：{save_path}")
+            if paired_diffs is not None:
+                save_paired_differences(paired_diffs, f"{plot_title} (paired differences)",
+                                        save_path.replace('.png', '_paired_diff.png'))
 
     # 2. 角色需拆分的情况（Tricky游戏：Learner行玩家 + Learner列玩家）
     else:
         for opp_name, opp_class in OPPONENTS.items():
             # 2.1 Learner作为行玩家，对抗当前对手（列玩家）
-            row_learner_data = {}
-            for learner_name, learner_class in LEARNER_CLASSES.items():
-                row_learner_data[learner_name] = get_learner_data(
-                    learner_class=learner_class,
-                    opponent_class=opp_class,
-                    payoff_matrix=payoff_matrix,
-                    actions=actions,
-                    is_learner_row=True,
-                    seed=SEED + seed_offset
-                )
-                seed_offset += 1
+            row_learner_data, row_paired_diffs, seed_offset = collect_learner_data(
+                opp_class, payoff_matrix, actions, is_learner_row=True, seed_offset=seed_offset)
             # 绘制Learner行玩家的图
             row_title = f"{scene_name}: 3 Learners (Row) vs {opp_name.replace('_Opp', '')}"
             row_save_path = f"plots/{scene_name.lower().replace(' ', '_')}_row_learners_vs_{opp_name.lower().replace('_opp', '')}.png"
             plot_three_learners(row_learner_data, row_title, row_save_path)
             print(f"→ 已生成：{row_save_path}")
+            if row_paired_diffs is not None:
+                save_paired_differences(row_paired_diffs, f"{row_title} (paired differences)",
+                                        row_save_path.replace('.png', '_paired_diff.png'))
 
             # 2.2 Learner作为列玩家，对抗当前对手（行玩家）
-            col_learner_data = {}
-            for learner_name, learner_class in LEARNER_CLASSES.items():
-                col_learner_data[learner_name] = get_learner_data(
-                    learner_class=learner_class,
-                    opponent_class=opp_class,
-                    payoff_matrix=payoff_matrix,
-                    actions=actions,
-                    is_learner_row=False,
-                    seed=SEED + seed_offset
-                )
-                seed_offset += 1
+            col_learner_data, col_paired_diffs, seed_offset = collect_learner_data(
+                opp_class, payoff_matrix, actions, is_learner_row=False, seed_offset=seed_offset)
             # 绘制Learner列玩家的图
             col_title = f"{scene_name}: 3 Learners (Col) vs {opp_name.replace('_Opp', '')}"
             col_save_path = f"plots/{scene_name.lower().replace(' ', '_')}_col_learners_vs_{opp_name.lower().replace('_opp', '')}.png"
             plot_three_learners(col_learner_data, col_title, col_save_path)
             print(f"→ 已生成：{col_save_path}")
+            if col_paired_diffs is not None:
+                save_paired_differences(col_paired_diffs, f"{col_title} (paired differences)",
+                                        col_save_path.replace('.png', '_paired_diff.png'))
 
     print(f"=== {scene_name} 实验完成 ===\n")
 
 
+def plot_paired_differences(paired_diffs, title, save_path=None):
+    """
+    绘制配对差分曲线（Learner A - Learner B）及95%置信区间，图例中标注方差缩减倍数
+    :param paired_diffs: 键=(Learner A, Learner B)，值=(diff_mean, ci, variance_reduction)
+    """
+    plt.figure(figsize=(10, 6))
+    diff_colors = ['purple', 'orange', 'teal']
+    for (name_a, name_b), color in zip(paired_diffs.keys(), diff_colors):
+        diff_mean, ci, variance_reduction = paired_diffs[(name_a, name_b)]
+        steps = range(1, len(diff_mean) + 1)
+        plt.plot(steps, diff_mean, color=color, linewidth=2,
+                 label=f"{name_a} - {name_b} (VR x{variance_reduction:.1f})")
+        plt.fill_between(steps, diff_mean - ci, diff_mean + ci, color=color, alpha=0.2)
+    plt.axhline(0.0, color='black', linewidth=1)
+    plt.xlabel('Number of iterations', fontsize=12)
+    plt.ylabel('Paired difference of average payoff', fontsize=12)
+    plt.title(title, fontsize=14)
+    plt.legend(fontsize=10)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    if save_path:
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def save_paired_differences(paired_diffs, title, save_path):
+    """
+    CRN模式下：绘制配对差分图，并打印最后一步的差分、置信区间和方差缩减倍数
+    """
+    plot_paired_differences(paired_diffs, title, save_path)
+    print(f"→ 已生成：{save_path}")
+    for (name_a, name_b), (diff_mean, ci, variance_reduction) in paired_diffs.items():
+        print(f"  {name_a} - {name_b}: {diff_mean[-1]:+.3f} ± {ci[-1]:.3f}（方差缩减 x{variance_reduction:.2f}）")
+
+
 # -------------------------- 主函数：运行所有场景实验 --------------------------
 if __name__ == "__main__":
     # 1. 囚徒困境（角色对称，生成3张图）
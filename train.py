@@ -1,13 +1,35 @@
-from game import get_actual_action
+from game import get_actual_action, SyncedRandom
 from SPaM_Agent import SPaM_Agent
 from FP_Agent import FP_Agent
 from WoLF_PHC_Agent import WoLF_PHC_Agent
 import numpy as np
 import random
-def single_experiment(agent1, agent2, payoff_matrix, actions, total_steps=5000, noise=0.05):
+
+# 智能体名称 -> 类（三种Learner/对手算法：SPaM/FP/WoLF-PHC，main.py与决策服务端共用）
+AGENT_CLASSES = {
+    'SPaM': SPaM_Agent,
+    'FP': FP_Agent,
+    'WoLF-PHC': WoLF_PHC_Agent
+}
+
+
+def update_agent(agent, self_act, opp_act, self_pay, opp_pay):
+    """
+         按智能体类型调用对应的update（SPaM需要双方收益，FP/WoLF-PHC只需动作）
+    """
+    if isinstance(agent, SPaM_Agent):
+        agent.update(self_act, opp_act, self_pay, opp_pay)
+    elif isinstance(agent, FP_Agent):
+        agent.update(self_act, opp_act)
+    elif isinstance(agent, WoLF_PHC_Agent):
+        agent.update(self_act, opp_act)
+
+
+def single_experiment(agent1, agent2, payoff_matrix, actions, total_steps=5000, noise=0.05, noise_uniforms=None):
     """
          单轮实验：两个智能体博弈total_steps轮
     :param noise: 扰动概率（默认0.05 -> 95%执行意图动作）
+    :param noise_uniforms: 可选，预先抽取的扰动随机数（agent1数组, agent2数组），形状均为 total_steps × 2
     """
     agent1_total_pay = 0.0
     agent2_total_pay = 0.0
@@ -18,8 +40,12 @@ def single_experiment(agent1, agent2, payoff_matrix, actions, total_steps=5000,
         agent1_intend_act = agent1.choose_action()
         agent2_intend_act = agent2.choose_action()
         
-        agent1_act = get_actual_action(agent1_intend_act, actions, noise=noise)
-        agent2_act = get_actual_action(agent2_intend_act, actions, noise=noise)
+        if noise_uniforms is None:
+            agent1_act = get_actual_action(agent1_intend_act, actions, noise=noise)
+            agent2_act = get_actual_action(agent2_intend_act, actions, noise=noise)
+        else:
+            agent1_act = get_actual_action(agent1_intend_act, actions, noise=noise, u=noise_uniforms[0][step - 1])
+            agent2_act = get_actual_action(agent2_intend_act, actions, noise=noise, u=noise_uniforms[1][step - 1])
         
         joint_act = (agent1_act, agent2_act)
         agent1_pay = payoff_matrix[joint_act][0]
@@ -33,19 +59,8 @@ def single_experiment(agent1, agent2, payoff_matrix, actions, total_steps=5000,
         agent2_avg_pays.append(agent2_avg)
         
         # 更新智能体
-        if isinstance(agent1, SPaM_Agent):
-            agent1.update(agent1_act, agent2_act, agent1_pay, agent2_pay)
-        elif isinstance(agent1, FP_Agent):
-            agent1.update(agent1_act, agent2_act)
-        elif isinstance(agent1, WoLF_PHC_Agent):
-            agent1.update(agent1_act, agent2_act)
-        
-        if isinstance(agent2, SPaM_Agent):
-            agent2.update(agent2_act, agent1_act, agent2_pay, agent1_pay)
-        elif isinstance(agent2, FP_Agent):
-            agent2.update(agent2_act, agent1_act)
-        elif isinstance(agent2, WoLF_PHC_Agent):
-            agent2.update(agent2_act, agent1_act)
+        update_agent(agent1, agent1_act, agent2_act, agent1_pay, agent2_pay)
+        update_agent(agent2, agent2_act, agent1_act, agent2_pay, agent1_pay)
     
     return agent1_avg_pays, agent2_avg_pays
 
@@ -79,3 +94,50 @@ def repeat_experiments(agent1_class, agent2_class, payoff_matrix, actions,
     agent2_std = np.std(agent2_all_pays, axis=0)
     
     return (agent1_mean, agent1_std), (agent2_mean, agent2_std)
+
+
+def crn_experiments(learner_classes, opponent_class, payoff_matrix, actions, num_repeats=50, total_steps=5000,
+                    is_learner_row=True, noise=0.05, seed=0, antithetic=False):
+    """
+         公共随机数（CRN）实验：多个Learner对抗同一对手，同一重复编号下共享
+         环境扰动随机数（get_actual_action）和对手的随机数流，使Learner之间的差异不再包含抽样噪声
+         环境扰动每步固定使用两个预先抽取的随机数；每个智能体有独立的随机流，且每步choose_action
+         消耗固定个数的随机数（SPaM 2个，FP/WoLF-PHC 1个），因此各随机流都逐次对齐。
+         但对手状态不同（如最优动作集合、策略概率不同）时，同一个均匀随机数可能对应不同的动作
+    :param learner_classes: 字典，Learner名称 -> 类
+    :param is_learner_row: True=Learner是行玩家，False=Learner是列玩家
+    :param antithetic: True=每个重复再用对偶随机流（u -> 1-u）跑一次，两次的平均作为一个样本
+    :return: (samples, runs)，均为字典 Learner名称 -> 收益曲线数组
+             samples 形状 num_repeats × total_steps（对偶模式下为每对的平均）
+             runs    形状 (num_repeats × 每个样本的运行次数) × total_steps（单次运行的曲线）
+    """
+    flips = [False, True] if antithetic else [False]
+    runs = {name: [] for name in learner_classes}
+    for repeat in range(num_repeats):
+        # 每个重复派生三条独立的随机流：环境扰动、对手、Learner
+        noise_seq, opp_seq, learner_seq = np.random.SeedSequence([seed, repeat]).spawn(3)
+        # 形状 total_steps × 2(agent1/agent2) × 2(是否扰动/选哪个其他动作)
+        base_uniforms = np.random.default_rng(noise_seq).random((total_steps, 2, 2))
+        opp_seed = int(opp_seq.generate_state(1)[0])
+        learner_seed = int(learner_seq.generate_state(1)[0])
+        for flip in flips:
+            uniforms = 1.0 - base_uniforms if flip else base_uniforms
+            noise_uniforms = (uniforms[:, 0], uniforms[:, 1])
+            for name, learner_class in learner_classes.items():
+                learner = learner_class(payoff_matrix, actions, is_row_player=is_learner_row,
+                                        rng=SyncedRandom(learner_seed, antithetic=flip))
+                opponent = opponent_class(payoff_matrix, actions, is_row_player=not is_learner_row,
+                                          rng=SyncedRandom(opp_seed, antithetic=flip))
+                if is_learner_row:
+                    learner_pays, _ = single_experiment(learner, opponent, payoff_matrix, actions,
+                                                        total_steps, noise, noise_uniforms)
+                else:
+                    _, learner_pays = single_experiment(opponent, learner, payoff_matrix, actions,
+                                                        total_steps, noise, noise_uniforms)
+                runs[name].append(learner_pays)
+
+    runs = {name: np.array(curves) for name, curves in runs.items()}
+    # 同一重复的（原始, 对偶）两次运行相邻存放，取平均得到一个样本
+    samples = {name: curves.reshape(num_repeats, len(flips), total_steps).mean(axis=1)
+               for name, curves in runs.items()}
+    return samples, runs